@@ -2,24 +2,43 @@
 """
 PlantUML to Markdown Documentation Generator
 
-This script converts .puml files to PNG images and generates corresponding
+This script converts .puml files to SVG images and generates corresponding
 Markdown documentation files with embedded images.
 
 Usage:
     python generate_docs.py
 """
 
+import hashlib
+import json
 import os
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 
 
 # Configuration
 PUML_DIR = Path(__file__).parent / "puml"
 OUTPUT_IMG_DIR = Path(__file__).parent / "images"
 OUTPUT_MD_DIR = Path(__file__).parent / "md"
+CACHE_MANIFEST = OUTPUT_IMG_DIR / ".cache.json"
+
+# Relative link prefix from the Markdown directory to the image directory
+IMG_REL_PREFIX = Path(os.path.relpath(OUTPUT_IMG_DIR, OUTPUT_MD_DIR)).as_posix() + "/"
+
+# Bump when the generator output changes so cached SVGs/Markdown are rebuilt
+CACHE_VERSION = 2
+
+# Buffer size for generated files, large enough to write each one in a single call
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Buffer size for reading .puml files; the title is normally in the first block
+READ_BUFFER_SIZE = 1 << 16
+
+# Matches a PlantUML "title" directive at the start of a line
+_TITLE_RE = re.compile(r"^[ \t]*title[ \t]+(.+)$", re.MULTILINE)
 
 # Diagram metadata: descriptions for each diagram
 DIAGRAM_DESCRIPTIONS = {
@@ -283,46 +302,191 @@ points, error handling, and post-processing actions.
 }
 
 
-def extract_title_from_puml(puml_content: str) -> str:
-    """Extract the title from PlantUML content."""
-    match = re.search(r'title\s+(.+)', puml_content)
-    if match:
-        return match.group(1).strip()
-    return "Untitled Diagram"
+# "Related Diagrams" links for each diagram category, keyed by name substring
+RELATED_BY_CATEGORY = {
+    "architecture": (
+        "- [Domain Model](./senzu-ai-class-diagram.md)\n"
+        "- [Deployment Architecture](./senzu-ai-deployment-diagram.md)\n"
+        "- [Database Schema](./senzu-ai-database-schema.md)\n"
+    ),
+    "sequence": (
+        "- [Backend Architecture](./senzu-ai-backend-architecture.md)\n"
+        "- [Service Interfaces](./senzu-ai-service-interfaces.md)\n"
+    ),
+    "class": (
+        "- [Database Schema](./senzu-ai-database-schema.md)\n"
+        "- [Service Interfaces](./senzu-ai-service-interfaces.md)\n"
+    ),
+}
+
+
+def related_diagrams_for(diagram_name: str) -> str:
+    """Return the "Related Diagrams" links for a diagram based on its type."""
+    name = diagram_name.lower()
+    if "architecture" in name:
+        return RELATED_BY_CATEGORY["architecture"]
+    if "sequence" in name or "flow" in name:
+        return RELATED_BY_CATEGORY["sequence"]
+    if "class" in name:
+        return RELATED_BY_CATEGORY["class"]
+    return ""
+
+
+def write_text_file(path: Path, content: str) -> None:
+    """Write content to path as UTF-8 through a single large buffer."""
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(content)
+
+
+def hash_content(content: bytes) -> str:
+    """Return the SHA-1 hex digest of content, salted with the cache version."""
+    return hashlib.sha1(f"{CACHE_VERSION}:".encode() + content).hexdigest()
 
 
-def generate_png_from_puml(puml_file: Path, output_dir: Path) -> Path:
+def load_cache_manifest(manifest_file: Path) -> Dict[str, Dict[str, Any]]:
     """
-    Generate PNG image from PlantUML file using plantuml command.
+    Load the cache manifest mapping diagram names to content hashes.
 
     Args:
-        puml_file: Path to .puml file
-        output_dir: Directory to save PNG file
+        manifest_file: Path to the JSON manifest
 
     Returns:
-        Path to generated PNG file
+        Mapping of diagram name to {"puml": hash, "markdown": hash,
+        "mtime_ns": int, "size": int}, or an empty dict if the manifest is missing, unreadable, or from another version
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        manifest = json.loads(manifest_file.read_text())
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get("version") != CACHE_VERSION:
+        return {}
+    return manifest.get("diagrams", {})
+
+
+def save_cache_manifest(diagrams: Dict[str, Dict[str, Any]], manifest_file: Path) -> None:
+    """Write the cache manifest for the diagrams generated in this run."""
+    write_text_file(
+        manifest_file,
+        json.dumps({"version": CACHE_VERSION, "diagrams": diagrams}, indent=2, sort_keys=True),
+    )
+
+
+def metadata_hash(puml_hash: str, metadata: Dict[str, Any]) -> str:
+    """Return the cache key for a diagram's Markdown: its source hash plus its metadata."""
+    return hash_content(f"{puml_hash}:{json.dumps(metadata, sort_keys=True)}".encode())
 
-    # Run plantuml command
-    cmd = ["plantuml", "-tpng", "-o", str(output_dir.absolute()), str(puml_file.absolute())]
-    result = subprocess.run(cmd, capture_output=True, text=True)
 
-    if result.returncode != 0:
-        raise RuntimeError(f"PlantUML conversion failed: {result.stderr}")
+def extract_title_from_puml(puml_file: Path) -> str:
+    """Extract the title from a PlantUML file, reading only up to the title line."""
+    with puml_file.open("r", encoding="utf-8", buffering=READ_BUFFER_SIZE) as f:
+        for line in f:
+            match = _TITLE_RE.match(line)
+            if match:
+                return match.group(1).strip()
+    return "Untitled Diagram"
 
-    # PlantUML creates PNG with same name as .puml file
-    png_file = output_dir / f"{puml_file.stem}.png"
 
-    if not png_file.exists():
-        raise FileNotFoundError(f"Expected PNG file not created: {png_file}")
+def get_diagram_metadata(puml_file: Path) -> Dict[str, str]:
+    """
+    Get the title and description for a diagram.
 
-    return png_file
+    Diagrams listed in DIAGRAM_DESCRIPTIONS are returned without touching the
+    .puml file; only undocumented diagrams are read for their title.
+
+    Args:
+        puml_file: Path to .puml file
+
+    Returns:
+        Dict with "title" and "description" keys
+    """
+    metadata = DIAGRAM_DESCRIPTIONS.get(puml_file.stem)
+    if metadata is not None:
+        return metadata
+
+    extracted_title = extract_title_from_puml(puml_file)
+    return {
+        "title": extracted_title,
+        "description": f"Documentation for {extracted_title}."
+    }
+
+
+def run_plantuml(puml_files: List[Path], output_dir: Path) -> subprocess.CompletedProcess:
+    """Run plantuml once over puml_files, writing SVGs to output_dir."""
+    cmd = [
+        "plantuml", "-tsvg", "-nbthread", "auto",
+        "-o", str(output_dir.absolute()),
+        *[str(puml_file.absolute()) for puml_file in puml_files],
+    ]
+    # stdout is just progress chatter; stderr is kept for error reporting
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def generate_svgs_from_puml(
+    puml_files: List[Path],
+    output_dir: Path
+) -> Tuple[Dict[Path, Path], Dict[Path, str]]:
+    """
+    Generate SVG images for a batch of PlantUML files with a single plantuml run.
+
+    Passing every file to one plantuml process pays the JVM startup cost once
+    instead of once per diagram; -nbthread lets PlantUML render them in parallel.
+    If the batch fails, its stderr is printed and none of its output is trusted
+    (PlantUML still writes an error image for a broken diagram), so each file
+    is re-rendered on its own to find the ones that actually failed.
+
+    Args:
+        puml_files: Paths to .puml files
+        output_dir: Directory to save SVG files
+
+    Returns:
+        Tuple of (mapping of each rendered .puml file to its SVG file,
+        mapping of each failed .puml file to its error message). Failed
+        files have their SVG removed.
+    """
+    # PlantUML creates each SVG with the same name as its .puml file
+    svg_targets = {puml_file: output_dir / f"{puml_file.stem}.svg" for puml_file in puml_files}
+
+    # Remove old images so one left over from an earlier run can't pass for a fresh render
+    for svg_file in svg_targets.values():
+        svg_file.unlink(missing_ok=True)
+
+    result = run_plantuml(puml_files, output_dir)
+    if result.returncode == 0:
+        svg_files = {}
+        errors = {}
+        for puml_file, svg_file in svg_targets.items():
+            if svg_file.exists():
+                svg_files[puml_file] = svg_file
+            else:
+                errors[puml_file] = f"Expected SVG file not created: {svg_file}"
+        return svg_files, errors
+
+    stderr = result.stderr.decode("utf-8", errors="replace")
+    print(f"⚠ plantuml exited with status {result.returncode}:")
+    print(stderr.rstrip())
+    if len(puml_files) > 1:
+        print("  → Re-rendering each diagram to find failures...")
+
+    svg_files = {}
+    errors = {}
+    for puml_file, svg_file in svg_targets.items():
+        svg_file.unlink(missing_ok=True)
+        # A batch of one already failed on its own; don't run it twice
+        single = result if len(puml_files) == 1 else run_plantuml([puml_file], output_dir)
+        if single.returncode == 0 and svg_file.exists():
+            svg_files[puml_file] = svg_file
+        else:
+            svg_file.unlink(missing_ok=True)
+            single_stderr = single.stderr.decode("utf-8", errors="replace").strip()
+            errors[puml_file] = f"PlantUML conversion failed: {single_stderr or f'exit status {single.returncode}'}"
+
+    return svg_files, errors
 
 
 def generate_markdown_doc(
     diagram_name: str,
-    png_path: Path,
+    svg_path: Path,
     title: str,
     description: str,
     output_dir: Path
@@ -332,7 +496,7 @@ def generate_markdown_doc(
 
     Args:
         diagram_name: Name of the diagram (without extension)
-        png_path: Path to PNG image file
+        svg_path: Path to SVG image file
         title: Diagram title
         description: Diagram description
         output_dir: Directory to save Markdown file
@@ -340,12 +504,11 @@ def generate_markdown_doc(
     Returns:
         Path to generated Markdown file
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
-
     # Create relative path from md directory to images directory
-    rel_img_path = os.path.relpath(png_path, output_dir)
+    rel_img_path = f"{IMG_REL_PREFIX}{svg_path.name}"
 
-    markdown_content = f"""# {title}
+    parts = [
+        f"""# {title}
 
 {description.strip()}
 
@@ -355,35 +518,25 @@ def generate_markdown_doc(
 
 ## Related Diagrams
 
-"""
-
-    # Add related diagrams based on diagram type
-    if "architecture" in diagram_name.lower():
-        markdown_content += "- [Domain Model](./senzu-ai-class-diagram.md)\n"
-        markdown_content += "- [Deployment Architecture](./senzu-ai-deployment-diagram.md)\n"
-        markdown_content += "- [Database Schema](./senzu-ai-database-schema.md)\n"
-    elif "sequence" in diagram_name.lower() or "flow" in diagram_name.lower():
-        markdown_content += "- [Backend Architecture](./senzu-ai-backend-architecture.md)\n"
-        markdown_content += "- [Service Interfaces](./senzu-ai-service-interfaces.md)\n"
-    elif "class" in diagram_name.lower():
-        markdown_content += "- [Database Schema](./senzu-ai-database-schema.md)\n"
-        markdown_content += "- [Service Interfaces](./senzu-ai-service-interfaces.md)\n"
-
-    markdown_content += """
+""",
+        # Add related diagrams based on diagram type
+        related_diagrams_for(diagram_name),
+        f"""
 ## Source
 
 This documentation was automatically generated from PlantUML diagrams.
 
 - Source file: [`../puml/{diagram_name}.puml`](../puml/{diagram_name}.puml)
-- Image: [`../images/{diagram_name}.png`](../images/{diagram_name}.png)
+- Image: [`../images/{diagram_name}.svg`](../images/{diagram_name}.svg)
 
 ## Navigation
 
 Return to [Documentation Index](./README.md)
-""".format(diagram_name=diagram_name)
+""",
+    ]
 
     md_file = output_dir / f"{diagram_name}.md"
-    md_file.write_text(markdown_content)
+    write_text_file(md_file, "".join(parts))
 
     return md_file
 
@@ -448,7 +601,7 @@ python generate_docs.py
 ```
 docs/plantuml/
 ├── puml/              # PlantUML source files (.puml)
-├── images/            # Generated PNG images
+├── images/            # Generated SVG images
 ├── md/                # Generated Markdown documentation
 ├── generate_docs.py   # Documentation generator script
 └── README.md          # This file
@@ -461,7 +614,7 @@ docs/plantuml/
 """
 
     index_file = output_dir / "README.md"
-    index_file.write_text(markdown_content)
+    write_text_file(index_file, markdown_content)
 
     return index_file
 
@@ -483,37 +636,101 @@ def main():
 
     generated_docs = []
 
+    # Create output directories once; the helpers assume they exist
+    OUTPUT_IMG_DIR.mkdir(parents=True, exist_ok=True)
+    OUTPUT_MD_DIR.mkdir(parents=True, exist_ok=True)
+
+    # The index only depends on static metadata, so write it while the diagrams render
+    index_executor = ThreadPoolExecutor(max_workers=1)
+    index_future = index_executor.submit(
+        generate_index,
+        [(name, metadata["title"]) for name, metadata in sorted(DIAGRAM_DESCRIPTIONS.items())],
+        OUTPUT_MD_DIR,
+    )
+    index_executor.shutdown(wait=False)
+
+    # Only diagrams whose source changed since the last run need rendering
+    cache = load_cache_manifest(CACHE_MANIFEST)
+    new_cache = {}
+    puml_stats = {}
+    puml_hashes = {}
+    svg_files = {}
+    svg_errors = {}
+    stale_files = []
+
+    for puml_file in puml_files:
+        # Trust the cached hash while the file's mtime and size are unchanged
+        stat = puml_file.stat()
+        puml_stats[puml_file] = stat
+        entry = cache.get(puml_file.stem, {})
+        if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+            puml_hash = entry["puml"]
+        else:
+            puml_hash = hash_content(puml_file.read_bytes())
+        puml_hashes[puml_file] = puml_hash
+
+        svg_file = OUTPUT_IMG_DIR / f"{puml_file.stem}.svg"
+        if entry.get("puml") == puml_hash and svg_file.exists():
+            svg_files[puml_file] = svg_file
+        else:
+            stale_files.append(puml_file)
+
+    # Render every changed diagram in one plantuml run, then build Markdown from the results
+    if stale_files:
+        print(f"Generating SVGs for {len(stale_files)} changed diagram(s)...")
+        try:
+            rendered, svg_errors = generate_svgs_from_puml(stale_files, OUTPUT_IMG_DIR)
+            svg_files.update(rendered)
+        except Exception as e:
+            print(f"✗ Error: {e}")
+            return
+    else:
+        print("All SVGs up to date")
+    print()
+
     for puml_file in puml_files:
         diagram_name = puml_file.stem
         print(f"Processing: {diagram_name}")
 
-        # Read PlantUML content to extract title
-        puml_content = puml_file.read_text()
-        extracted_title = extract_title_from_puml(puml_content)
-
         # Get metadata
-        metadata = DIAGRAM_DESCRIPTIONS.get(diagram_name, {
-            "title": extracted_title,
-            "description": f"Documentation for {extracted_title}."
-        })
+        metadata = get_diagram_metadata(puml_file)
 
         try:
-            # Generate PNG
-            print(f"  → Generating PNG...")
-            png_path = generate_png_from_puml(puml_file, OUTPUT_IMG_DIR)
-            print(f"  ✓ Created: {png_path.name}")
-
-            # Generate Markdown
-            print(f"  → Generating Markdown...")
-            md_path = generate_markdown_doc(
-                diagram_name,
-                png_path,
-                metadata["title"],
-                metadata["description"],
-                OUTPUT_MD_DIR
-            )
-            print(f"  ✓ Created: {md_path.name}")
-
+            # svg_files only holds confirmed images: cache hits and clean renders from this run
+            svg_path = svg_files.get(puml_file)
+            if svg_path is None:
+                raise RuntimeError(svg_errors.get(
+                    puml_file,
+                    f"Expected SVG file not created: {OUTPUT_IMG_DIR / f'{diagram_name}.svg'}"
+                ))
+            if puml_file in stale_files:
+                print(f"  ✓ Created: {svg_path.name}")
+            else:
+                print(f"  ✓ Up to date: {svg_path.name}")
+
+            # Generate Markdown unless the source and metadata are unchanged
+            md_hash = metadata_hash(puml_hashes[puml_file], metadata)
+            md_path = OUTPUT_MD_DIR / f"{diagram_name}.md"
+            if cache.get(diagram_name, {}).get("markdown") == md_hash and md_path.exists():
+                print(f"  ✓ Up to date: {md_path.name}")
+            else:
+                print(f"  → Generating Markdown...")
+                md_path = generate_markdown_doc(
+                    diagram_name,
+                    svg_path,
+                    metadata["title"],
+                    metadata["description"],
+                    OUTPUT_MD_DIR
+                )
+                print(f"  ✓ Created: {md_path.name}")
+
+            # Failed diagrams never get an entry, so the next run renders them again
+            new_cache[diagram_name] = {
+                "puml": puml_hashes[puml_file],
+                "markdown": md_hash,
+                "mtime_ns": puml_stats[puml_file].st_mtime_ns,
+                "size": puml_stats[puml_file].st_size,
+            }
             generated_docs.append((diagram_name, metadata["title"]))
             print()
 
@@ -522,9 +739,10 @@ def main():
             print()
             continue
 
-    # Generate index
-    print("Generating index...")
-    index_path = generate_index(generated_docs, OUTPUT_MD_DIR)
+    save_cache_manifest(new_cache, CACHE_MANIFEST)
+
+    # Wait for the index written in the background
+    index_path = index_future.result()
     print(f"✓ Created: {index_path.name}")
     print()
 